@@ -0,0 +1,85 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+DEFAULT_USER_CACHE_TTL = 30  # seconds
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+_next_sweep_at = 0.0
+
+
+def get_cached_user(user_id):
+    """Return a copy of the cached user for ``user_id``, or None if missing or expired."""
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del _user_cache[user_id]
+            return None
+    # Hand out a copy so per-request mutations never leak into the shared entry
+    return copy.copy(user)
+
+
+def cache_user(user):
+    ttl = getattr(settings, 'USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL)
+    if ttl <= 0:
+        return
+    global _next_sweep_at
+    now = time.monotonic()
+    with _user_cache_lock:
+        # Users who stop making requests are never looked up again, so drop expired entries here;
+        # sweeping at most once per TTL keeps the cache bounded by the users seen in the last two TTLs
+        if now >= _next_sweep_at:
+            for user_id in [user_id for user_id, (expires_at, _) in _user_cache.items() if expires_at < now]:
+                del _user_cache[user_id]
+            _next_sweep_at = now + ttl
+        _user_cache[user.pk] = (now + ttl, copy.copy(user))
+
+
+def invalidate_cached_user(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+def clear_user_cache():
+    global _next_sweep_at
+    with _user_cache_lock:
+        _user_cache.clear()
+        _next_sweep_at = 0.0
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that keeps recently resolved users in a short-TTL in-process cache,
+    so session-authenticated requests skip the user lookup query.
+    The session auth hash is still verified by Django against the cached user.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache_user(user)
+        return user
+
+
+class OwnerScopedViewSetMixin:
+    """
+    Restricts a viewset to the objects owned by the requesting user.
+    Because ownership is part of the queryset, detail actions fetch the object and check
+    ownership in a single query on (pk, owner) instead of a lookup followed by a permission check.
+    """
+    owner_field = 'owner'
+
+    def get_owner_id(self):
+        return self.request.user.pk
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{f'{self.owner_field}_id': self.get_owner_id()})
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_EVENTS = {
+    'BACKEND': 'task.events.InMemoryBackend',
+    'HEARTBEAT': 15,  # seconds between keepalive comments on idle streams
+    'OPTIONS': {},
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class Subscription:
+    """One subscriber's queue, bound to the event loop that created it."""
+
+    def __init__(self, owner_id, max_queue_size):
+        self.owner_id = owner_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on ``self.loop``; a subscriber that falls behind is cut off and expected to reconnect
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """Return the next event, or None if ``timeout`` seconds pass without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BaseEventBackend:
+    """Interface for event backends; ``publish`` may be called from any thread."""
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+
+    def subscribe(self, owner_id):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, owner_id, event):
+        raise NotImplementedError
+
+
+class InMemoryBackend(BaseEventBackend):
+    """Fans events out to the subscribers of this process only."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, owner_id):
+        subscription = Subscription(owner_id, self.max_queue_size)
+        with self._lock:
+            self._subscribers[owner_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.owner_id]
+
+    def subscriber_count(self, owner_id=None):
+        with self._lock:
+            if owner_id is not None:
+                return len(self._subscribers.get(owner_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, owner_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(owner_id, ()))
+        # One wake-up per event loop rather than per subscriber
+        by_loop = defaultdict(list)
+        for subscription in subscribers:
+            by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver_all, subscriptions, event)
+            except RuntimeError:
+                # The subscribers' loop has been closed
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+
+def deliver_all(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.deliver(event)
+
+
+def get_events_settings():
+    return {**DEFAULT_EVENTS, **getattr(settings, 'TASK_EVENTS', {})}
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = get_events_settings()
+            _backend = import_string(config['BACKEND'])(**config['OPTIONS'])
+        return _backend
+
+
+def reset_backend():
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def publish(owner_id, event_type, **data):
+    """Send ``event_type`` to ``owner_id``'s subscribers once the current transaction commits."""
+    event = {'type': event_type, **data}
+    transaction.on_commit(partial(get_backend().publish, owner_id, event))
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_events(owner_id):
+    """Yield Server-Sent Events for ``owner_id`` until the client disconnects or falls behind."""
+    backend = get_backend()
+    heartbeat = get_events_settings()['HEARTBEAT']
+    subscription = backend.subscribe(owner_id)
+    try:
+        yield 'retry: 3000\n\n'
+        while not subscription.overflowed:
+            event = await subscription.get(timeout=heartbeat)
+            yield ': keepalive\n\n' if event is None else format_event(event)
+    finally:
+        backend.unsubscribe(subscription)
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import socket
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, \
+    teardown_test_environment
+from rest_framework.test import APIClient
+
+from task.access import clear_user_cache
+from task.models import Label, Task
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark API endpoints: queries and latency per request. All data is removed afterwards.'
+    # These serve requests from a separate server process, so their data is committed and deleted afterwards
+    committed_scenarios = {'events'}
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(self.scenarios()), help='Endpoints to benchmark')
+        parser.add_argument('--iterations', type=int, default=200, help='Requests per measured endpoint')
+        parser.add_argument('--tasks', type=int, default=100, help='Tasks owned by the user in list scenarios')
+        parser.add_argument('--subscribers', type=int, default=1000, help='Idle event streams to hold open')
+
+    def scenarios(self):
+        return {
+            'detail': self.bench_detail,
+            'list': self.bench_list,
+            'events': self.bench_events,
+        }
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            if options['scenario'] in self.committed_scenarios:
+                self.scenarios()[options['scenario']](options)
+                return
+            with transaction.atomic():
+                self.scenarios()[options['scenario']](options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+            clear_user_cache()
+
+    def measure(self, label, request, iterations):
+        """Issue ``request(i)`` ``iterations`` times and report queries and latency per request."""
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(iterations):
+                start = time.perf_counter()
+                response = request(i)
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{label} returned {response.status_code}')
+        timings.sort()
+        self.stdout.write(
+            f'{label:<32} queries/req={len(queries) / iterations:5.2f} '
+            f'median={statistics.median(timings):7.3f}ms p95={timings[int(len(timings) * 0.95) - 1]:7.3f}ms'
+        )
+
+    def bench_detail(self, options):
+        iterations = options['iterations']
+        user = User.objects.create_user(username='benchmark-user', password='benchmark-password')
+        task = Task.objects.create(title='Benchmark task', owner=user)
+        doomed = [Task.objects.create(title=f'Benchmark task {i}', owner=user) for i in range(iterations * 2)]
+
+        for ttl, cache_state in ((0, 'user cache off'), (30, 'user cache on')):
+            clear_user_cache()
+            with override_settings(USER_CACHE_TTL=ttl):
+                client = APIClient()
+                client.force_login(user)
+                offset = 0 if ttl == 0 else iterations
+                self.measure(
+                    f'retrieve ({cache_state})', lambda i: client.get(f'/api/tasks/{task.pk}/'), iterations
+                )
+                self.measure(
+                    f'update ({cache_state})',
+                    lambda i: client.patch(f'/api/tasks/{task.pk}/', {'is_completed': i % 2 == 0}, format='json'),
+                    iterations,
+                )
+                self.measure(
+                    f'destroy ({cache_state})',
+                    lambda i: client.delete(f'/api/tasks/{doomed[offset + i].pk}/'),
+                    iterations,
+                )
+
+    def bench_list(self, options):
+        user = User.objects.create_user(username='benchmark-user', password='benchmark-password')
+        labels = [Label.objects.create(name=f'Benchmark label {i}', owner=user) for i in range(5)]
+        for i in range(options['tasks']):
+            task = Task.objects.create(title=f'Benchmark task {i}', owner=user)
+            task.labels.set(labels[:i % len(labels) + 1])
+
+        client = APIClient()
+        client.force_login(user)
+        for enabled, snapshot_state in ((False, 'label snapshot off'), (True, 'label snapshot on')):
+            with override_settings(TASK_LABEL_SNAPSHOT=enabled):
+                self.measure(f'list ({snapshot_state})', lambda i: client.get('/api/tasks/'), options['iterations'])
+
+    def bench_events(self, options):
+        """
+        Hold idle /api/events/ streams open against a uvicorn worker and time how long a task update takes to
+        reach all of them. Memory is the worker's RSS growth, so it includes the server, request and response
+        cost of each connection, not just the broker. Linux only: it raises the open file limit and reads RSS
+        from /proc.
+        """
+        if not sys.platform.startswith('linux'):
+            raise CommandError('The events scenario only runs on Linux.')
+        import resource
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        user = User.objects.create_user(username='benchmark-user', password='benchmark-password')
+        client = APIClient()
+        client.force_login(user)
+        session_key = client.cookies[settings.SESSION_COOKIE_NAME].value
+        try:
+            task = Task.objects.create(title='Benchmark task', owner=user)
+            asyncio.run(self.fan_out(session_key, task.pk, options['subscribers'], options['iterations']))
+        finally:
+            user.delete()
+            Session.objects.filter(session_key=session_key).delete()
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    async def fan_out(self, session_key, task_id, subscriber_count, iterations):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'uvicorn', 'task_management.asgi:application',
+            '--port', str(port), '--log-level', 'warning', '--backlog', str(subscriber_count),
+            cwd=settings.BASE_DIR,
+        )
+        # Any well-formed token is accepted as long as the cookie and header match
+        csrf_token = 'b' * 32
+        cookies = f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf_token}'
+        streams = []
+        try:
+            await self.wait_for_port(port)
+            baseline = process_rss_kib(server.pid)
+
+            async def open_stream():
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(f'GET /api/events/ HTTP/1.1\r\nHost: localhost\r\nCookie: {cookies}\r\n\r\n'.encode())
+                buffer = b''
+                while b'retry: 3000' not in buffer:
+                    chunk = await reader.read(4096)
+                    if not chunk:
+                        raise RuntimeError(f'Event stream closed early: {buffer[:200]!r}')
+                    buffer += chunk
+                streams.append((reader, writer))
+
+            for start in range(0, subscriber_count, 500):
+                await asyncio.gather(*(open_stream() for _ in range(min(500, subscriber_count - start))))
+            held = process_rss_kib(server.pid) - baseline
+            self.stdout.write(
+                f'{subscriber_count} idle /api/events/ streams held by one uvicorn worker: '
+                f'RSS +{held / 1024:.1f}MiB ({held * 1024 / subscriber_count:.0f} bytes each)'
+            )
+
+            remaining = 0
+            received = asyncio.Event()
+
+            async def consume(reader):
+                nonlocal remaining
+                while chunk := await reader.read(4096):
+                    remaining -= chunk.count(b'event: task.updated')
+                    if remaining <= 0:
+                        received.set()
+
+            consumers = [asyncio.create_task(consume(reader)) for reader, _ in streams]
+            timings = []
+            for i in range(iterations):
+                remaining = subscriber_count
+                received.clear()
+                body = json.dumps({'is_completed': i % 2 == 0}).encode()
+                start = time.perf_counter()
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(
+                    f'PATCH /api/tasks/{task_id}/ HTTP/1.1\r\nHost: localhost\r\nCookie: {cookies}\r\n'
+                    f'X-CSRFToken: {csrf_token}\r\nContent-Type: application/json\r\n'
+                    f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+                )
+                await reader.read()
+                writer.close()
+                await received.wait()
+                timings.append((time.perf_counter() - start) * 1000)
+            for consumer in consumers:
+                consumer.cancel()
+        finally:
+            for _, writer in streams:
+                writer.close()
+            server.terminate()
+            await server.wait()
+
+        timings.sort()
+        self.stdout.write(
+            f'update to event on all {subscriber_count} streams: median={statistics.median(timings):.3f}ms '
+            f'p95={timings[int(len(timings) * 0.95) - 1]:.3f}ms'
+        )
+
+    async def wait_for_port(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', port)
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+            else:
+                writer.close()
+                return
+
+
+def process_rss_kib(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    raise RuntimeError(f'No RSS reported for process {pid}.')
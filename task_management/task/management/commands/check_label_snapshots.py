@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from task.models import Task
+from task.snapshots import SNAPSHOT_BATCH_SIZE, build_label_snapshots, refresh_label_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Compare Task.label_snapshot with the task/label through table and optionally repair drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild inconsistent snapshots')
+
+    def handle(self, *args, **options):
+        stale = []
+        queryset = Task.objects.order_by('pk').values_list('pk', 'label_snapshot')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:SNAPSHOT_BATCH_SIZE])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            expected = build_label_snapshots([pk for pk, _ in batch])
+            stale.extend(pk for pk, snapshot in batch if snapshot != expected[pk])
+
+        if not stale:
+            self.stdout.write(self.style.SUCCESS('All task label snapshots are consistent.'))
+            return
+
+        for pk in stale:
+            self.stdout.write(f'Task {pk}: label snapshot out of date')
+        if not options['fix']:
+            raise CommandError(f'{len(stale)} task label snapshot(s) out of date; rerun with --fix to rebuild them.')
+        refresh_label_snapshots(stale)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(stale)} task label snapshot(s).'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from task.startup import import_time_by_app, import_time_by_package, profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Start a worker in a fresh interpreter and report its startup phases, import time per app/module and RSS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--settings-module', help='Settings to profile, e.g. task_management.settings_production. '
+                                      'Defaults to DJANGO_SETTINGS_MODULE.'
+        )
+        parser.add_argument('--limit', type=int, default=15, help='Rows shown per import table')
+        parser.add_argument(
+            '--requests', type=int, default=0, help='Also serve this many requests and report steady-state RSS'
+        )
+
+    def handle(self, *args, **options):
+        result = profile_startup(options['settings_module'], options['requests'])
+        imports = result['imports']
+        limit = options['limit']
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Startup phases'))
+        for phase, seconds in result['phases'].items():
+            self.stdout.write(f'  {phase:<40} {seconds * 1000:9.1f}ms')
+        self.stdout.write(f"  {'cold start':<40} {result['cold_start'] * 1000:9.1f}ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time per installed app (self)'))
+        by_app = import_time_by_app(imports, result['installed_apps'])
+        for app, us in sorted(by_app.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  {app:<40} {us / 1000:9.1f}ms')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time per top-level package (self)'))
+        by_package = sorted(import_time_by_package(imports).items(), key=lambda item: -item[1])
+        for package, us in by_package[:limit]:
+            self.stdout.write(f'  {package:<40} {us / 1000:9.1f}ms')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest modules (self)'))
+        for module, self_us, _, _ in sorted(imports, key=lambda record: -record[1])[:limit]:
+            self.stdout.write(f'  {module:<40} {self_us / 1000:9.1f}ms')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Memory'))
+        self.stdout.write(f"  {'RSS after startup':<40} {result['startup_rss_kib'] / 1024:9.1f}MiB")
+        if 'steady_rss_kib' in result:
+            self.stdout.write(
+                f"  {'RSS after %d requests' % options['requests']:<40} {result['steady_rss_kib'] / 1024:9.1f}MiB"
+            )
+            self.stdout.write(f"  {'RSS growth after warmup':<40} {result['rss_growth_kib'] / 1024:9.1f}MiB")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from task.models import Task
+from task.positions import owners_needing_rebalance, rebalance_positions
+
+
+class Command(BaseCommand):
+    help = 'Respread task positions for owners whose ranks have grown too long. Meant to run periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, action='append', help='Rebalance this owner id regardless of length')
+        parser.add_argument('--all', action='store_true', help='Rebalance every owner')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            owner_ids = Task.objects.values_list('owner_id', flat=True).distinct()
+        else:
+            owner_ids = options['owner'] or owners_needing_rebalance()
+        owner_ids = list(owner_ids)
+        for owner_id in owner_ids:
+            rebalance_positions(owner_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebalanced task positions for {len(owner_ids)} owner(s).'))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:23
+
+from django.db import migrations, models
+
+
+def populate_label_snapshot(apps, schema_editor):
+    Task = apps.get_model('task', 'Task')
+    snapshots = {}
+    rows = Task.labels.through.objects.order_by('label_id').values_list(
+        'task_id', 'label_id', 'label__name', 'label__owner_id'
+    )
+    for task_id, label_id, name, owner_id in rows:
+        snapshots.setdefault(task_id, []).append({'id': label_id, 'name': name, 'owner': owner_id})
+    tasks = list(Task.objects.filter(pk__in=list(snapshots)).only('pk'))
+    for task in tasks:
+        task.label_snapshot = snapshots[task.pk]
+    Task.objects.bulk_update(tasks, ['label_snapshot'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='label_snapshot',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(populate_label_snapshot, migrations.RunPython.noop),
+    ]
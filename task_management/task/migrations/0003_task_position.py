@@ -0,0 +1,55 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+RANK_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+RANK_BASE = len(RANK_DIGITS)
+
+
+def spread_ranks(count):
+    # Frozen copy of task.positions.spread_ranks as of this migration
+    width = 1
+    while RANK_BASE ** width < (count + 1) * RANK_BASE:
+        width += 1
+    step = RANK_BASE ** width // (count + 1)
+    ranks = []
+    for n in range(1, count + 1):
+        value = n * step
+        digits = ''
+        for _ in range(width):
+            value, digit = divmod(value, RANK_BASE)
+            digits = RANK_DIGITS[digit] + digits
+        ranks.append(digits.rstrip('0'))
+    return ranks
+
+
+def populate_position(apps, schema_editor):
+    Task = apps.get_model('task', 'Task')
+    owner_ids = list(Task.objects.values_list('owner_id', flat=True).distinct())
+    for owner_id in owner_ids:
+        tasks = list(Task.objects.filter(owner_id=owner_id).order_by('id').only('pk'))
+        for task, rank in zip(tasks, spread_ranks(len(tasks))):
+            task.position = rank
+        Task.objects.bulk_update(tasks, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task', '0002_task_label_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='position',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'position'], name='task_owner_position_idx'),
+        ),
+        migrations.RunPython(populate_position, migrations.RunPython.noop),
+    ]
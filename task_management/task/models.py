@@ -2,8 +2,13 @@ from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from .positions import POSITION_MAX_LENGTH, rank_between
+
 User = settings.AUTH_USER_MODEL
 
+# Task columns only written by their own maintenance code, never by a full save() of a possibly stale instance
+TASK_MANAGED_FIELDS = ('label_snapshot', 'position')
+
 
 class Label(models.Model):
     name = models.CharField(max_length=255)
@@ -32,12 +37,32 @@ class Task(models.Model):
     is_completed = models.BooleanField(default=False)
     owner = models.ForeignKey(User, related_name='tasks', on_delete=models.CASCADE)
     labels = models.ManyToManyField(Label, related_name='tasks', blank=True)
+    # Denormalized [{id, name, owner}, ...] copy of labels, maintained by task.signals
+    label_snapshot = models.JSONField(default=list, blank=True, editable=False)
+    # Lexicographic rank within the owner's tasks, see task.positions
+    position = models.CharField(max_length=POSITION_MAX_LENGTH, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'position'], name='task_owner_position_idx'),
+        ]
 
     def clean(self):
         if not self.title.strip():
             raise ValidationError('Task title cannot be empty or just whitespace.')
 
     def save(self, *args, **kwargs):
+        if self._state.adding and not self.position:
+            # New tasks go to the end of the owner's list
+            last = Task.objects.filter(owner_id=self.owner_id).order_by('-position').values_list(
+                'position', flat=True
+            ).first()
+            self.position = rank_between(last, None)
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in TASK_MANAGED_FIELDS
+            ]
         self.full_clean()
         super().save(*args, **kwargs)
 
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Length
+
+from .events import publish
+
+# Lowercase base-36 keeps the same order under binary and case-insensitive collations
+RANK_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+RANK_BASE = len(RANK_DIGITS)
+RANK_APPEND_WIDTH = 6
+# Matches Task.position; a move that would exceed it rebalances inline as a last resort
+POSITION_MAX_LENGTH = 255
+DEFAULT_REBALANCE_LENGTH = 32
+
+
+def rank_between(lower=None, upper=None):
+    """
+    Return a rank strictly between ``lower`` and ``upper``; None means the list edge.
+    Generated ranks never end in '0', so there is always room to insert before them.
+    An empty ``upper`` (a task that never got a rank) has no room below it and is rejected.
+    """
+    lower = lower or ''
+    if upper is None:
+        return rank_after(lower)
+    if not upper:
+        raise ValueError('Cannot rank below an empty rank; rebalance first.')
+    rank = ''
+    bounded = True
+    for i in range(len(lower) + len(upper) + 1):
+        low = RANK_DIGITS.index(lower[i]) if i < len(lower) else 0
+        high = RANK_DIGITS.index(upper[i]) if bounded else RANK_BASE
+        if high - low > 1:
+            return rank + RANK_DIGITS[(low + high) // 2]
+        rank += RANK_DIGITS[low]
+        # Once the rank drops below ``upper`` at this digit, later digits are unbounded
+        bounded = bounded and high == low
+    raise ValueError(f'No rank between {lower!r} and {upper!r}.')
+
+
+def rank_after(rank):
+    """
+    Return a rank greater than ``rank`` for appending to the end of a list.
+    Appends count up at a fixed width of RANK_APPEND_WIDTH digits, carrying into higher digits,
+    so they only lengthen a rank once every rank of that width is used up.
+    """
+    if not rank:
+        return RANK_DIGITS[RANK_BASE // 2]
+    prefix = rank[:RANK_APPEND_WIDTH].ljust(RANK_APPEND_WIDTH, '0')
+    value = sum(RANK_DIGITS.index(digit) * RANK_BASE ** i for i, digit in enumerate(reversed(prefix))) + 1
+    if value % RANK_BASE == 0:
+        value += 1
+    if value >= RANK_BASE ** RANK_APPEND_WIDTH:
+        return rank + RANK_DIGITS[RANK_BASE // 2]
+    return encode_rank(value, RANK_APPEND_WIDTH)
+
+
+def encode_rank(value, width):
+    """Encode ``value`` as ``width`` base-36 digits without trailing zeros."""
+    digits = ''
+    for _ in range(width):
+        value, digit = divmod(value, RANK_BASE)
+        digits = RANK_DIGITS[digit] + digits
+    return digits.rstrip('0')
+
+
+def spread_ranks(count):
+    """Return ``count`` increasing, evenly spaced ranks of a fixed width with room on both sides."""
+    width = 1
+    while RANK_BASE ** width < (count + 1) * RANK_BASE:
+        width += 1
+    step = RANK_BASE ** width // (count + 1)
+    return [encode_rank(n * step, width) for n in range(1, count + 1)]
+
+
+def rebalance_positions(owner_id):
+    """Reassign evenly spaced positions to every task of ``owner_id``, preserving the current order."""
+    from .models import Task
+
+    with transaction.atomic():
+        tasks = list(Task.objects.select_for_update().filter(owner_id=owner_id).order_by('position', 'id').only('pk'))
+        for task, rank in zip(tasks, spread_ranks(len(tasks))):
+            task.position = rank
+        Task.objects.bulk_update(tasks, ['position'], batch_size=500)
+        publish(owner_id, 'task.reordered')
+
+
+def owners_needing_rebalance():
+    from .models import Task
+
+    limit = getattr(settings, 'TASK_POSITION_REBALANCE_LENGTH', DEFAULT_REBALANCE_LENGTH)
+    return Task.objects.annotate(position_length=Length('position')).filter(
+        Q(position_length__gt=limit) | Q(position='')
+    ).values_list('owner_id', flat=True).distinct()
@@ -19,10 +19,30 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'is_completed', 'owner', 'labels']
-        read_only_fields = ['owner']
+        fields = ['id', 'title', 'description', 'is_completed', 'owner', 'labels', 'position']
+        read_only_fields = ['owner', 'position']
 
     def create(self, validated_data):
         user = self.context['request'].user
         task = Task.objects.create(owner=user, **validated_data)
         return task
+
+
+class TaskSnapshotSerializer(TaskSerializer):
+    """Renders labels from the denormalized ``Task.label_snapshot`` instead of the M2M table."""
+    labels = serializers.JSONField(source='label_snapshot', read_only=True)
+
+
+class TaskMoveSerializer(serializers.Serializer):
+    """Neighbors to place a task between; ``after`` precedes it and ``before`` follows it."""
+    after = serializers.IntegerField(required=False, allow_null=True)
+    before = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if attrs.get('after') is None and attrs.get('before') is None:
+            raise serializers.ValidationError('Provide at least one of "after" or "before".')
+        if attrs.get('after') is not None and attrs.get('after') == attrs.get('before'):
+            raise serializers.ValidationError('"after" and "before" must be different tasks.')
+        if self.context['task'].pk in (attrs.get('after'), attrs.get('before')):
+            raise serializers.ValidationError('A task cannot be moved next to itself.')
+        return attrs
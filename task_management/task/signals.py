@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .access import invalidate_cached_user
+from .events import publish
+from .models import Label, Task
+from .snapshots import refresh_label_snapshots
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_on_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=Task.labels.through)
+def refresh_snapshot_on_labels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # task.labels.add/remove/set/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            # Keep the changed instance in step too, so code holding it sees its current labels
+            instance.label_snapshot = refresh_label_snapshots([instance.pk]).get(instance.pk, [])
+    elif action == 'pre_clear':
+        # label.tasks.clear() does not report the affected tasks afterwards
+        instance._snapshot_task_ids = list(instance.tasks.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_label_snapshots(getattr(instance, '_snapshot_task_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_label_snapshots(pk_set)
+
+
+@receiver(post_save, sender=Label)
+def refresh_snapshot_on_label_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_label_snapshots(instance.tasks.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Label)
+def collect_snapshot_tasks_on_label_delete(sender, instance, **kwargs):
+    instance._snapshot_task_ids = list(instance.tasks.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Label)
+def refresh_snapshot_on_label_deleted(sender, instance, **kwargs):
+    refresh_label_snapshots(getattr(instance, '_snapshot_task_ids', []))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Label)
+def publish_on_save(sender, instance, created, **kwargs):
+    action = 'created' if created else 'updated'
+    publish(instance.owner_id, f'{sender._meta.model_name}.{action}', id=instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Label)
+def publish_on_delete(sender, instance, **kwargs):
+    publish(instance.owner_id, f'{sender._meta.model_name}.deleted', id=instance.pk)
+
+
+@receiver(m2m_changed, sender=Task.labels.through)
+def publish_on_labels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        publish(instance.owner_id, 'task.updated', id=instance.pk)
+        return
+    task_ids = getattr(instance, '_snapshot_task_ids', []) if action == 'post_clear' else pk_set
+    for task_id in sorted(task_ids):
+        publish(instance.owner_id, 'task.updated', id=task_id)
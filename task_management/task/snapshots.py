@@ -0,0 +1,31 @@
+from .models import Task
+
+SNAPSHOT_BATCH_SIZE = 500
+
+
+def build_label_snapshots(task_ids):
+    """Return ``{task_id: [{id, name, owner}, ...]}`` read from the task/label through table."""
+    snapshots = {task_id: [] for task_id in task_ids}
+    rows = Task.labels.through.objects.filter(task_id__in=task_ids).order_by('label_id').values_list(
+        'task_id', 'label_id', 'label__name', 'label__owner_id'
+    )
+    for task_id, label_id, name, owner_id in rows:
+        snapshots[task_id].append({'id': label_id, 'name': name, 'owner': owner_id})
+    return snapshots
+
+
+def refresh_label_snapshots(task_ids):
+    """
+    Rebuild ``Task.label_snapshot`` for the given tasks; ids of deleted tasks are ignored.
+    Returns the written snapshots by task id.
+    """
+    written = {}
+    task_ids = sorted(set(task_ids))
+    for start in range(0, len(task_ids), SNAPSHOT_BATCH_SIZE):
+        batch = task_ids[start:start + SNAPSHOT_BATCH_SIZE]
+        snapshots = build_label_snapshots(batch)
+        tasks = list(Task.objects.filter(pk__in=batch).only('pk'))
+        for task in tasks:
+            task.label_snapshot = written[task.pk] = snapshots[task.pk]
+        Task.objects.bulk_update(tasks, ['label_snapshot'])
+    return written
@@ -0,0 +1,137 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+# Runs in a fresh interpreter so nothing is already imported or cached
+PROBE = '''
+import json, os, resource, sys, time
+
+def rss_kib():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+phases = {}
+start = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+phases['settings'] = time.perf_counter() - start
+
+mark = time.perf_counter()
+django.setup()
+phases['apps'] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from importlib import import_module
+import_module(settings.ROOT_URLCONF)
+phases['urls'] = time.perf_counter() - mark
+
+mark = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+phases['middleware'] = time.perf_counter() - mark
+
+result = {
+    'phases': phases,
+    'cold_start': time.perf_counter() - start,
+    'startup_rss_kib': rss_kib(),
+    'installed_apps': list(settings.INSTALLED_APPS),
+}
+
+requests = int(sys.argv[1])
+if requests:
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+    from task.models import Task
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = get_user_model().objects.create_user(username='probe-user', password='probe-password')
+        for i in range(20):
+            Task.objects.create(title=f'Probe task {i}', owner=user)
+        client = APIClient()
+        client.force_login(user)
+
+        # Let caches and lazy imports settle before taking the steady-state baseline
+        warmup = max(requests // 5, 1)
+        for _ in range(warmup):
+            client.get('/api/tasks/')
+        baseline = rss_kib()
+        for _ in range(requests):
+            client.get('/api/tasks/')
+        result['steady_rss_kib'] = rss_kib()
+        result['rss_growth_kib'] = result['steady_rss_kib'] - baseline
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+print(json.dumps(result))
+'''
+
+
+def profile_startup(settings_module=None, requests=0):
+    """
+    Start a worker in a fresh interpreter and measure it.
+
+    Returns the probe's phase timings, cold start and RSS figures, plus the
+    ``python -X importtime`` records as ``(module, self_us, cumulative_us, depth)``.
+    With ``requests``, the worker also serves that many task list requests
+    against a throwaway test database and reports its steady-state RSS.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module or os.environ['DJANGO_SETTINGS_MODULE']}
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, str(requests)],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode:
+        raise RuntimeError(f'Startup probe failed:\n{completed.stderr[-2000:]}')
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['imports'] = parse_import_times(completed.stderr)
+    return result
+
+
+def parse_import_times(output):
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def import_time_by_package(imports):
+    """Sum self import time per top-level package, in microseconds."""
+    totals = defaultdict(int)
+    for module, self_us, _, _ in imports:
+        totals[module.split('.')[0]] += self_us
+    return dict(totals)
+
+
+def import_time_by_app(imports, app_modules):
+    """Sum self import time of the modules inside each app's package, in microseconds."""
+    totals = dict.fromkeys(app_modules, 0)
+    # Longest prefix first so django.contrib.auth.* is not counted under a shorter app module
+    prefixes = sorted(app_modules, key=len, reverse=True)
+    for module, self_us, _, _ in imports:
+        for app in prefixes:
+            if module == app or module.startswith(app + '.'):
+                totals[app] += self_us
+                break
+    return totals
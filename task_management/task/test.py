@@ -1,15 +1,42 @@
+import asyncio
+import importlib
+import sys
+import threading
+import time
+
 import pytest
-from django.core.exceptions import ValidationError
+from asgiref.sync import async_to_sync
+from django.core.management import call_command, CommandError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from . import access
+from .access import cache_user, clear_user_cache, get_cached_user
+from .events import BaseEventBackend, InMemoryBackend, get_backend, reset_backend
 from .models import Task, Label
+from .positions import RANK_APPEND_WIDTH, rank_between, rebalance_positions
+from .startup import import_time_by_app, parse_import_times, profile_startup
 
 User = get_user_model()
 
 
+class RecordingBackend(BaseEventBackend):
+    """Event backend that keeps published events for assertions."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.events = []
+
+    def publish(self, owner_id, event):
+        self.events.append((owner_id, event))
+
+
 @pytest.mark.django_db
 class TestTaskManagementViewSets:
 
@@ -286,6 +313,75 @@ class TestTaskManagementViewSets:
             assert response.data['owner'] == expected_owner_id
 
 
+@pytest.mark.django_db
+class TestOwnerScopedAccess:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        clear_user_cache()
+        self.client = APIClient()
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password2')
+        self.task1 = Task.objects.create(title="Task 1", owner=self.user1)
+        self.client.login(username='user1', password='password1')
+        # Warm the user cache so measured requests only hit the session and the owned object
+        self.client.get('/api/labels/')
+
+    @pytest.mark.parametrize(
+        "method, payload, expected_queries",
+        [
+            ('get', None, 3),  # Session, task scoped to owner, labels prefetch
+            ('patch', {'is_completed': True}, 5),  # Session, task, owner validation, update, labels
+            ('delete', None, 4),  # Session, task, task_labels cascade, delete
+        ]
+    )
+    def test_detail_query_count(self, django_assert_num_queries, method, payload, expected_queries):
+        with django_assert_num_queries(expected_queries):
+            response = getattr(self.client, method)(f'/api/tasks/{self.task1.id}/', payload, format='json')
+        assert response.status_code < 400
+
+    @pytest.mark.parametrize("method", ['get', 'patch', 'delete'])
+    def test_detail_of_other_owner_is_not_found(self, method):
+        self.client.login(username='user2', password='password2')
+        response = getattr(self.client, method)(f'/api/tasks/{self.task1.id}/', {}, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert Task.objects.filter(id=self.task1.id).exists()
+
+    def test_user_change_invalidates_cache(self):
+        cache_user(self.user1)
+        assert get_cached_user(self.user1.pk) is not None
+        self.user1.set_password('new-password')
+        self.user1.save()
+        assert get_cached_user(self.user1.pk) is None
+        # The old session no longer matches the password hash
+        response = self.client.get(f'/api/tasks/{self.task1.id}/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_sessions_from_model_backend_stay_valid(self):
+        client = APIClient()
+        client.force_login(self.user2, backend='django.contrib.auth.backends.ModelBackend')
+        response = client.get('/api/tasks/')
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_expired_users_are_evicted(self, settings, monkeypatch):
+        settings.USER_CACHE_TTL = 30
+        now = time.monotonic()
+        monkeypatch.setattr(access.time, 'monotonic', lambda: now)
+        cache_user(self.user1)
+        now += 31
+        assert get_cached_user(self.user1.pk) is None
+        cache_user(self.user1)
+        now += 31
+        # user1 is never looked up again; caching another user sweeps its expired entry
+        cache_user(self.user2)
+        assert set(access._user_cache) == {self.user2.pk}
+
+    def test_user_cache_disabled(self, settings):
+        settings.USER_CACHE_TTL = 0
+        cache_user(self.user2)
+        assert get_cached_user(self.user2.pk) is None
+
+
 @pytest.mark.django_db
 class TestLabelModel:
 
@@ -386,3 +482,404 @@ class TestTaskModel:
         task_labels = Label.objects.filter(name__in=labels, owner=self.user1)
         task.labels.add(*task_labels)
         assert task.labels.count() == expected_labels
+
+
+@pytest.mark.django_db
+class TestLabelSnapshot:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.work = Label.objects.create(name="Work", owner=self.user1)
+        self.home = Label.objects.create(name="Home", owner=self.user1)
+        self.task1 = Task.objects.create(title="Task 1", owner=self.user1)
+        self.task2 = Task.objects.create(title="Task 2", owner=self.user1)
+
+    def snapshot_names(self, task):
+        task.refresh_from_db()
+        return [label['name'] for label in task.label_snapshot]
+
+    def test_task_side_label_changes(self):
+        self.task1.labels.add(self.home, self.work)
+        assert self.snapshot_names(self.task1) == ["Work", "Home"]
+        self.task1.labels.remove(self.work)
+        assert self.snapshot_names(self.task1) == ["Home"]
+        self.task1.labels.clear()
+        assert self.snapshot_names(self.task1) == []
+
+    def test_label_side_task_changes(self):
+        self.work.tasks.add(self.task1, self.task2)
+        assert self.snapshot_names(self.task1) == ["Work"]
+        assert self.snapshot_names(self.task2) == ["Work"]
+        self.work.tasks.clear()
+        assert self.snapshot_names(self.task1) == []
+        assert self.snapshot_names(self.task2) == []
+
+    def test_save_after_label_change_keeps_snapshot(self):
+        self.task1.labels.add(self.work)
+        assert [label['name'] for label in self.task1.label_snapshot] == ["Work"]
+        self.task1.title = "Task 1 renamed"
+        self.task1.save()
+        assert self.snapshot_names(self.task1) == ["Work"]
+
+    def test_stale_task_save_keeps_renamed_label(self):
+        self.task1.labels.add(self.work)
+        stale = Task.objects.get(pk=self.task1.pk)
+        self.work.name = "Office"
+        self.work.save()
+        stale.is_completed = True
+        stale.save()
+        assert self.snapshot_names(self.task1) == ["Office"]
+
+    def test_label_rename_and_delete(self):
+        self.task1.labels.add(self.work, self.home)
+        self.work.name = "Office"
+        self.work.save()
+        assert self.snapshot_names(self.task1) == ["Office", "Home"]
+        self.home.delete()
+        assert self.snapshot_names(self.task1) == ["Office"]
+
+    @pytest.mark.parametrize("enabled", [True, False])
+    def test_list_renders_labels(self, settings, enabled):
+        settings.TASK_LABEL_SNAPSHOT = enabled
+        self.task1.labels.add(self.work)
+        client = APIClient()
+        client.login(username='user1', password='password1')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/tasks/')
+        assert response.data[0]['labels'] == [{'id': self.work.id, 'name': "Work", 'owner': self.user1.id}]
+        assert any('task_task_labels' in query['sql'] for query in queries) is not enabled
+
+    def test_check_label_snapshots_command(self):
+        self.task1.labels.add(self.work)
+        call_command('check_label_snapshots')
+        Task.objects.filter(pk=self.task1.pk).update(label_snapshot=[])
+        with pytest.raises(CommandError):
+            call_command('check_label_snapshots')
+        call_command('check_label_snapshots', '--fix')
+        assert self.snapshot_names(self.task1) == ["Work"]
+
+
+@pytest.mark.django_db
+class TestTaskPosition:
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.client = APIClient()
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.user2 = User.objects.create_user(username='user2', password='password2')
+        self.tasks = [Task.objects.create(title=f"Task {i}", owner=self.user1) for i in range(4)]
+        self.other_task = Task.objects.create(title="Other", owner=self.user2)
+        self.client.login(username='user1', password='password1')
+
+    def ordered_titles(self):
+        response = self.client.get('/api/tasks/?ordering=position')
+        assert response.status_code == status.HTTP_200_OK
+        return [task['title'] for task in response.data]
+
+    def test_new_tasks_are_appended(self):
+        assert self.ordered_titles() == ["Task 0", "Task 1", "Task 2", "Task 3"]
+
+    @pytest.mark.parametrize(
+        "task_index, move, expected_titles",
+        [
+            (3, {'after': 0, 'before': 1}, ["Task 0", "Task 3", "Task 1", "Task 2"]),  # Between two neighbors
+            (0, {'after': 3}, ["Task 1", "Task 2", "Task 3", "Task 0"]),  # To the end
+            (2, {'before': 0}, ["Task 2", "Task 0", "Task 1", "Task 3"]),  # To the top
+            (0, {'after': 1}, ["Task 1", "Task 0", "Task 2", "Task 3"]),  # Next neighbor resolved from the list
+        ]
+    )
+    def test_move(self, task_index, move, expected_titles):
+        payload = {key: self.tasks[index].id for key, index in move.items()}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/tasks/{self.tasks[task_index].id}/move/', payload, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert [query['sql'].split()[0] for query in queries].count('UPDATE') == 1
+        assert self.ordered_titles() == expected_titles
+
+    def test_move_before_unranked_task(self):
+        unranked = Task.objects.bulk_create([Task(title="Unranked", owner=self.user1)])[0]
+        assert unranked.position == ''
+        response = self.client.post(f'/api/tasks/{self.tasks[2].id}/move/', {'before': unranked.id}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert self.ordered_titles()[:2] == ["Task 2", "Unranked"]
+        assert '' not in Task.objects.filter(owner=self.user1).values_list('position', flat=True)
+
+    def test_stale_task_save_keeps_moved_position(self):
+        stale = Task.objects.get(pk=self.tasks[3].pk)
+        response = self.client.post(f'/api/tasks/{stale.id}/move/', {'before': self.tasks[0].id}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        stale.is_completed = True
+        stale.save()
+        assert self.ordered_titles() == ["Task 3", "Task 0", "Task 1", "Task 2"]
+
+    @pytest.mark.parametrize(
+        "payload, expected_status",
+        [
+            ({}, status.HTTP_400_BAD_REQUEST),  # No neighbors
+            ({'after': 'other'}, status.HTTP_404_NOT_FOUND),  # Neighbor owned by another user
+            ({'after': 999}, status.HTTP_404_NOT_FOUND),  # Non-existent neighbor
+            ({'after': 2, 'before': 1}, status.HTTP_400_BAD_REQUEST),  # Neighbors in the wrong order
+            ({'after': 0}, status.HTTP_400_BAD_REQUEST),  # The moved task itself as a neighbor
+            ({'before': 0}, status.HTTP_400_BAD_REQUEST),  # The moved task itself as a neighbor
+        ]
+    )
+    def test_move_invalid(self, payload, expected_status):
+        payload = {
+            key: self.other_task.id if value == 'other' else self.tasks[value].id if value < 4 else value
+            for key, value in payload.items()
+        }
+        response = self.client.post(f'/api/tasks/{self.tasks[0].id}/move/', payload, format='json')
+        assert response.status_code == expected_status
+
+    def test_move_other_owners_task(self):
+        response = self.client.post(f'/api/tasks/{self.other_task.id}/move/', {'after': self.tasks[0].id})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_rebalance_preserves_order(self, settings):
+        settings.TASK_POSITION_REBALANCE_LENGTH = 255
+        for _ in range(60):
+            self.client.post(f'/api/tasks/{self.tasks[3].id}/move/', {'before': self.tasks[1].id}, format='json')
+            self.client.post(f'/api/tasks/{self.tasks[1].id}/move/', {'before': self.tasks[3].id}, format='json')
+        before = self.ordered_titles()
+        assert max(len(task.position) for task in Task.objects.filter(owner=self.user1)) > 8
+        rebalance_positions(self.user1.id)
+        assert self.ordered_titles() == before
+        assert max(len(task.position) for task in Task.objects.filter(owner=self.user1)) <= 2
+
+    def test_creates_do_not_rebalance(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            for i in range(50):
+                Task.objects.create(title=f"Extra {i}", owner=self.user1)
+        # Only the task.created events
+        assert len(callbacks) == 50
+
+    def test_rebalance_command_respreads_long_positions(self, settings):
+        settings.TASK_POSITION_REBALANCE_LENGTH = 4
+        for _ in range(6):
+            self.client.post(f'/api/tasks/{self.tasks[3].id}/move/', {'before': self.tasks[1].id}, format='json')
+            self.client.post(f'/api/tasks/{self.tasks[1].id}/move/', {'before': self.tasks[3].id}, format='json')
+        other_position = Task.objects.get(pk=self.other_task.pk).position
+        call_command('rebalance_task_positions')
+        assert max(len(task.position) for task in Task.objects.filter(owner=self.user1)) <= 4
+        assert self.ordered_titles() == ["Task 0", "Task 1", "Task 3", "Task 2"]
+        assert Task.objects.get(pk=self.other_task.pk).position == other_position
+
+    def test_move_into_exhausted_gap_rebalances(self):
+        Task.objects.filter(pk=self.tasks[0].pk).update(position='a' * 254)
+        Task.objects.filter(pk=self.tasks[1].pk).update(position='a' * 254 + '1')
+        response = self.client.post(
+            f'/api/tasks/{self.tasks[3].id}/move/',
+            {'after': self.tasks[0].id, 'before': self.tasks[1].id},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert self.ordered_titles() == ["Task 0", "Task 3", "Task 1", "Task 2"]
+        assert max(len(task.position) for task in Task.objects.filter(owner=self.user1)) <= 2
+
+
+@pytest.mark.django_db
+class TestChangeEvents:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, django_capture_on_commit_callbacks):
+        settings.TASK_EVENTS = {'BACKEND': 'task.test.RecordingBackend', 'OPTIONS': {}}
+        reset_backend()
+        self.capture_on_commit_callbacks = django_capture_on_commit_callbacks
+        self.user1 = User.objects.create_user(username='user1', password='password1')
+        self.label1 = Label.objects.create(name="Label 1", owner=self.user1)
+        yield
+        reset_backend()
+
+    def published(self, action):
+        backend = get_backend()
+        backend.events.clear()
+        with self.capture_on_commit_callbacks(execute=True):
+            action()
+        return [(owner_id, event['type'], event.get('id')) for owner_id, event in backend.events]
+
+    def test_events_wait_for_commit(self):
+        with self.capture_on_commit_callbacks() as callbacks:
+            task = Task.objects.create(title="Task 1", owner=self.user1)
+        assert get_backend().events == []
+        for callback in callbacks:
+            callback()
+        assert get_backend().events == [(self.user1.id, {'type': 'task.created', 'id': task.id})]
+
+    def test_model_changes_publish_events(self):
+        task = Task.objects.create(title="Task 1", owner=self.user1)
+        u = self.user1.id
+        assert self.published(lambda: task.labels.add(self.label1)) == [(u, 'task.updated', task.id)]
+        assert self.published(lambda: self.label1.tasks.clear()) == [(u, 'task.updated', task.id)]
+        assert self.published(lambda: self.label1.save()) == [(u, 'label.updated', self.label1.id)]
+        task_id = task.id
+        assert self.published(task.delete) == [(u, 'task.deleted', task_id)]
+
+    def test_move_publishes_event(self):
+        first = Task.objects.create(title="Task 1", owner=self.user1)
+        second = Task.objects.create(title="Task 2", owner=self.user1)
+        client = APIClient()
+        client.login(username='user1', password='password1')
+        events = self.published(lambda: client.post(f'/api/tasks/{second.id}/move/', {'before': first.id}))
+        assert events == [(self.user1.id, 'task.updated', second.id)]
+
+    def test_stream_requires_authentication(self):
+        response = async_to_sync(AsyncClient().get)('/api/events/')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_stream_requires_asgi(self):
+        client = APIClient()
+        client.login(username='user1', password='password1')
+        response = client.get('/api/events/')
+        assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+
+
+class TestRanks:
+
+    @pytest.mark.parametrize(
+        "lower, upper",
+        [
+            (None, None),
+            ("i", None),
+            (None, "i"),
+            ("a", "b"),
+            ("az", "b"),
+            ("a", "a01"),
+            ("zz", None),
+        ]
+    )
+    def test_rank_between(self, lower, upper):
+        rank = rank_between(lower, upper)
+        assert lower is None or lower < rank
+        assert upper is None or rank < upper
+        assert not rank.endswith('0')
+
+    def test_appends_keep_a_fixed_width(self):
+        rank = None
+        for _ in range(2000):
+            next_rank = rank_between(rank, None)
+            assert rank is None or rank < next_rank
+            assert len(next_rank) <= RANK_APPEND_WIDTH
+            rank = next_rank
+
+    def test_empty_upper_rank_is_rejected(self):
+        with pytest.raises(ValueError):
+            rank_between(None, '')
+
+    @pytest.mark.parametrize(
+        "rank",
+        [
+            "a",  # Shorter than the append width
+            "i00001i",  # Longer than the append width
+            "i0000z",  # Carries into the next digit
+            "zzzzzz",  # Every rank of the append width used up
+        ]
+    )
+    def test_append_after(self, rank):
+        next_rank = rank_between(rank, None)
+        assert rank < next_rank
+        assert not next_rank.endswith('0')
+
+
+class TestInMemoryBackend:
+
+    def test_fan_out_is_scoped_to_owner(self):
+        async def scenario():
+            backend = InMemoryBackend()
+            owner_subscriptions = [backend.subscribe(1) for _ in range(3)]
+            other_subscription = backend.subscribe(2)
+            publisher = threading.Thread(target=backend.publish, args=(1, {'type': 'task.updated', 'id': 5}))
+            publisher.start()
+            publisher.join()
+            received = [await subscription.get(timeout=1) for subscription in owner_subscriptions]
+            assert received == [{'type': 'task.updated', 'id': 5}] * 3
+            assert await other_subscription.get(timeout=0.01) is None
+            for subscription in owner_subscriptions:
+                backend.unsubscribe(subscription)
+            assert backend.subscriber_count() == 1
+
+        asyncio.run(scenario())
+
+    def test_slow_subscriber_is_cut_off(self):
+        async def scenario():
+            backend = InMemoryBackend(max_queue_size=2)
+            subscription = backend.subscribe(1)
+            for i in range(3):
+                backend.publish(1, {'type': 'task.updated', 'id': i})
+            await asyncio.sleep(0)
+            assert subscription.overflowed
+
+        asyncio.run(scenario())
+
+
+@pytest.mark.django_db(transaction=True)
+class TestEventStream:
+
+    def test_stream_delivers_owner_events(self, settings):
+        settings.TASK_EVENTS = {'BACKEND': 'task.events.InMemoryBackend', 'HEARTBEAT': 0.05, 'OPTIONS': {}}
+        reset_backend()
+        user = User.objects.create_user(username='user1', password='password1')
+
+        async def scenario():
+            client = AsyncClient()
+            await client.aforce_login(user)
+            response = await client.get('/api/events/')
+            assert response['Content-Type'] == 'text/event-stream'
+            chunks = aiter(response.streaming_content)
+            assert await anext(chunks) == b'retry: 3000\n\n'
+            assert get_backend().subscriber_count(user.id) == 1
+            assert await anext(chunks) == b': keepalive\n\n'
+            get_backend().publish(user.id, {'type': 'task.created', 'id': 7})
+            assert await anext(chunks) == b'event: task.created\ndata: {"type": "task.created", "id": 7}\n\n'
+            await chunks.aclose()
+
+        async_to_sync(scenario)()
+        reset_backend()
+
+
+class TestStartupBudget:
+    # Budgets for one worker on the production settings profile
+    COLD_START_BUDGET = 2.0  # seconds
+    STARTUP_RSS_BUDGET = 96 * 1024  # KiB
+    RSS_GROWTH_BUDGET = 8 * 1024  # KiB over the measured requests
+
+    @pytest.fixture(autouse=True)
+    def production_environment(self, monkeypatch):
+        monkeypatch.setenv('DJANGO_SECRET_KEY', 'test-secret-key')
+        monkeypatch.setenv('DJANGO_ALLOWED_HOSTS', 'example.com')
+
+    def import_production_settings(self):
+        sys.modules.pop('task_management.settings_production', None)
+        return importlib.import_module('task_management.settings_production')
+
+    def test_production_profile_is_lean(self):
+        production = self.import_production_settings()
+        assert production.DEBUG is False
+        for app in production.DEV_ONLY_APPS:
+            assert app not in production.INSTALLED_APPS
+        assert 'django.contrib.messages.middleware.MessageMiddleware' not in production.MIDDLEWARE
+
+    @pytest.mark.parametrize("variable", ['DJANGO_SECRET_KEY', 'DJANGO_ALLOWED_HOSTS'])
+    def test_production_profile_requires_environment(self, monkeypatch, variable):
+        monkeypatch.delenv(variable)
+        with pytest.raises(ImproperlyConfigured):
+            self.import_production_settings()
+
+    def test_import_time_parsing(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     django.contrib.auth.hashers\n"
+            "import time:        80 |        200 |   django.contrib.auth\n"
+            "import time:        50 |         50 | django.contrib.admin\n"
+        )
+        imports = parse_import_times(output)
+        assert imports[0] == ('django.contrib.auth.hashers', 120, 120, 2)
+        assert import_time_by_app(imports, ['django.contrib.auth', 'django.contrib.admin', 'task']) == {
+            'django.contrib.auth': 200, 'django.contrib.admin': 50, 'task': 0
+        }
+
+    def test_worker_within_budget(self):
+        result = profile_startup('task_management.settings_production', requests=500)
+        assert result['cold_start'] < self.COLD_START_BUDGET
+        assert result['startup_rss_kib'] < self.STARTUP_RSS_BUDGET
+        assert result['rss_growth_kib'] < self.RSS_GROWTH_BUDGET
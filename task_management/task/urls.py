@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, LabelViewSet
+from .views import TaskViewSet, LabelViewSet, task_events
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
 router.register(r'labels', LabelViewSet)
 
 urlpatterns = [
+    path('events/', task_events, name='task-events'),
     path('', include(router.urls)),
 ]
@@ -1,30 +1,106 @@
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from .access import OwnerScopedViewSetMixin
+from .events import publish, stream_events
 from .models import Task, Label
-from .serializers import TaskSerializer, LabelSerializer
+from .positions import POSITION_MAX_LENGTH, rank_between, rebalance_positions
+from .serializers import TaskSerializer, TaskSnapshotSerializer, TaskMoveSerializer, LabelSerializer
 from rest_framework.authentication import SessionAuthentication
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(OwnerScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     authentication_classes = (SessionAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    filter_backends = (OrderingFilter,)
+    ordering_fields = ('position', 'id')
+
+    def use_label_snapshot(self):
+        return self.action == 'list' and settings.TASK_LABEL_SNAPSHOT
 
     def get_queryset(self):
-        return Task.objects.filter(owner=self.request.user)
+        queryset = super().get_queryset()
+        # Writes re-read labels after saving, so prefetching them up front would be wasted
+        if self.action in ('list', 'retrieve') and not self.use_label_snapshot():
+            queryset = queryset.prefetch_related('labels')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.use_label_snapshot():
+            return TaskSnapshotSerializer
+        return super().get_serializer_class()
+
+    @action(detail=True, methods=['post'])
+    def move(self, request, pk=None):
+        """Place the task between two neighbors by rewriting only its own position."""
+        task = self.get_object()
+        serializer = TaskMoveSerializer(data=request.data, context={'task': task})
+        serializer.is_valid(raise_exception=True)
+        lower, upper = self.get_move_bounds(task, **serializer.validated_data)
+        # Long ranks are respread by the rebalance_task_positions command; only equal ranks left by
+        # concurrent inserts, empty ranks of tasks created without save(), or a gap too deep for the
+        # column force a rebalance here
+        if (
+            '' in (lower, upper)
+            or (lower is not None and lower == upper)
+            or len(rank_between(lower, upper)) > POSITION_MAX_LENGTH
+        ):
+            rebalance_positions(task.owner_id)
+            lower, upper = self.get_move_bounds(task, **serializer.validated_data)
+
+        task.position = rank_between(lower, upper)
+        Task.objects.filter(pk=task.pk).update(position=task.position)
+        publish(task.owner_id, 'task.updated', id=task.pk)
+        return Response(self.get_serializer(task).data)
+
+    def get_move_bounds(self, task, after=None, before=None):
+        """Return the positions surrounding the target slot, resolving a missing neighbor from the list."""
+        siblings = Task.objects.filter(owner_id=task.owner_id).exclude(pk=task.pk)
+        positions = dict(siblings.filter(pk__in=[after, before]).values_list('pk', 'position'))
+        for neighbor in (after, before):
+            if neighbor is not None and neighbor not in positions:
+                raise NotFound(f'Task {neighbor} not found.')
+
+        lower, upper = positions.get(after), positions.get(before)
+        if after is None:
+            lower = siblings.filter(position__lt=upper).order_by('-position').values_list('position', flat=True).first()
+        elif before is None:
+            upper = siblings.filter(position__gt=lower).order_by('position').values_list('position', flat=True).first()
+        elif lower > upper:
+            raise ValidationError('"after" must come before "before".')
+        return lower, upper
 
     def get_serializer_context(self):
         return {'request': self.request}
 
 
-class LabelViewSet(viewsets.ModelViewSet):
+class LabelViewSet(OwnerScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Label.objects.all()
     serializer_class = LabelSerializer
     authentication_classes = (SessionAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
-    def get_queryset(self):
-        return self.queryset.filter(owner=self.request.user)
-
     def get_serializer_context(self):
         return {'request': self.request}
+
+
+async def task_events(request):
+    """Server-Sent Events stream of the requesting user's task and label changes. Requires ASGI."""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI Django would buffer the endless stream and tie up the worker forever
+        return JsonResponse({'detail': 'Event streaming requires the ASGI application.'}, status=501)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+    return StreamingHttpResponse(
+        stream_events(user.pk),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
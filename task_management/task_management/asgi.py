@@ -2,6 +2,8 @@
 ASGI config for task_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve the project through it (e.g. with uvicorn or daphne) to stream change
+notifications from ``/api/events/``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
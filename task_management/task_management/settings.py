@@ -85,6 +85,41 @@ DATABASES = {
 }
 
 
+# Authentication
+# https://docs.djangoproject.com/en/5.1/topics/auth/customizing/#specifying-authentication-backends
+
+AUTHENTICATION_BACKENDS = [
+    'task.access.CachedModelBackend',
+    # Keeps sessions created before the cached backend valid; new logins use the cached one
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Seconds a resolved user stays in the in-process cache; 0 disables caching.
+# Saving or deleting a user only invalidates the cache of the process that did it: in other
+# workers a password change, is_active=False or permission change takes effect after up to
+# this many seconds.
+USER_CACHE_TTL = 30
+
+
+# Task app
+
+# Render task list labels from the denormalized Task.label_snapshot instead of joining task_labels
+TASK_LABEL_SNAPSHOT = True
+
+# Task positions longer than this are respread by the rebalance_task_positions command
+TASK_POSITION_REBALANCE_LENGTH = 32
+
+# Change notifications streamed from /api/events/; the in-memory backend only reaches subscribers
+# connected to the same process
+TASK_EVENTS = {
+    'BACKEND': 'task.events.InMemoryBackend',
+    'HEARTBEAT': 15,
+    'OPTIONS': {
+        'max_queue_size': 100,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -0,0 +1,65 @@
+"""
+Production settings for task_management project.
+
+Builds on the development settings but drops dev-only apps and middleware and
+turns off DEBUG, which also stops Django from recording every executed query.
+
+Select it with ``DJANGO_SETTINGS_MODULE=task_management.settings_production``;
+``DJANGO_SECRET_KEY`` and ``DJANGO_ALLOWED_HOSTS`` must be set in the environment.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY; production must not use the development key.')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured('Set DJANGO_ALLOWED_HOSTS to a comma-separated list of host names.')
+
+
+# Application definition
+
+DEV_ONLY_APPS = [
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'django_extensions',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_ONLY_APPS]
+
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware != 'django.contrib.messages.middleware.MessageMiddleware'
+]
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'OPTIONS': {
+            'context_processors': [
+                processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+                if processor != 'django.contrib.messages.context_processors.messages'
+            ],
+        },
+    },
+]
+
+
+# Django REST framework
+# JSON only: the browsable API is a development aid
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+}